@@ -5,11 +5,114 @@ Provides both synchronous and async interfaces
 """
 
 import asyncio
-from typing import Dict, List, Optional, Union
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import json
-from datetime import datetime
+from datetime import datetime, timezone
+# Shared reader, text cleaning, code lookup and SKU grouping helpers
+from acuity_invoice_parser import (
+    _clean_text, _convert_country_column, _convert_unit_column, _group_by_sku, _read_columns,
+)
+
+# Rust-based JSON encoder; falls back to the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Multithreaded C++ CSV writer; falls back to DataFrame.to_csv
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+
+# Streaming .xlsx writer; falls back to openpyxl through pandas
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+# constant_memory flushes each row to disk once the next row starts; text is
+# written literally (no formula/URL/number conversion), as with openpyxl
+_XLSX_OPTIONS = {
+    'constant_memory': True,
+    'strings_to_formulas': False,
+    'strings_to_urls': False,
+    'nan_inf_to_errors': True,
+}
+
+# Same header style pandas applies in DataFrame.to_excel
+_XLSX_HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+
+
+def _utc_timestamp() -> str:
+    """Current UTC time as an ISO 8601 string (millisecond precision)"""
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+
+
+def _to_records(df: pd.DataFrame) -> List[Dict]:
+    """Convert a line item DataFrame to dicts, with None for missing values"""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def _write_sheet(workbook, name: str, df: pd.DataFrame, header_format) -> None:
+    """Write a DataFrame to a new worksheet in row order (constant_memory safe)"""
+    worksheet = workbook.add_worksheet(name)
+    worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+    
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    for row_idx, row in enumerate(rows, start=1):
+        worksheet.write_row(row_idx, 0, row)
+
+
+def _read_invoice_file(agent_cls: type, path: str) -> Tuple[Dict, pd.DataFrame]:
+    """
+    Read an invoice's metadata and line items (module-level so it can run in the pool)
+    
+    The raw sheet goes out of scope once extracted, so only the compact line
+    item frame is returned.
+    """
+    agent = agent_cls()
+    df = agent._read_invoice(path)
+    return agent.extract_metadata(df), agent._extract_line_items(df)
+
+
+# Recently read invoices in this process, keyed on the agent class and the
+# file's resolved path, mtime and size. Entries are filled by sync reads and
+# by async reads done in the pool alike; they are shared and must not be mutated.
+_INVOICE_CACHE_SIZE = 8
+_invoice_cache: 'OrderedDict[Tuple, Tuple[Dict, pd.DataFrame]]' = OrderedDict()
+_invoice_cache_lock = threading.Lock()
+
+
+def _invoice_cache_key(agent_cls: type, file_path: Union[str, Path]) -> Tuple:
+    path = Path(file_path).resolve()
+    stat = os.stat(path)
+    return agent_cls, str(path), stat.st_mtime_ns, stat.st_size
+
+
+def _get_cached_invoice(key: Tuple) -> Optional[Tuple[Dict, pd.DataFrame]]:
+    with _invoice_cache_lock:
+        loaded = _invoice_cache.get(key)
+        if loaded is not None:
+            _invoice_cache.move_to_end(key)
+        return loaded
+
+
+def _cache_invoice(key: Tuple, loaded: Tuple[Dict, pd.DataFrame]) -> None:
+    with _invoice_cache_lock:
+        _invoice_cache[key] = loaded
+        _invoice_cache.move_to_end(key)
+        while len(_invoice_cache) > _INVOICE_CACHE_SIZE:
+            _invoice_cache.popitem(last=False)
 
 
 class AcuityInvoiceAgent:
@@ -47,6 +150,16 @@ class AcuityInvoiceAgent:
         'qty_unit': 21,         # V: UM
     }
     
+    # Leading columns holding invoice header info (see extract_metadata);
+    # kept contiguous so their positions survive column pruning on read
+    METADATA_COLUMNS = list(range(17))
+    
+    # Line item fields read as raw objects instead of type-inferred
+    TEXT_FIELDS = ('sku', 'description', 'hts', 'country_of_origin', 'qty_unit')
+    
+    # Line item fields with few distinct values, stored as categoricals
+    CATEGORY_FIELDS = ('sku', 'hts', 'country_of_origin', 'qty_unit')
+    
     def __init__(self, config: Optional[Dict] = None):
         """
         Initialize the agent
@@ -62,6 +175,16 @@ class AcuityInvoiceAgent:
         self.max_items = self.config.get('max_items', None)
         self.metadata = {}
     
+    @classmethod
+    def convert_country_series(cls, codes: pd.Series) -> pd.Series:
+        """Convert a column of 3-letter country codes to 2-letter ISO codes"""
+        return _convert_country_column(codes, cls.COUNTRY_CODES)
+    
+    @classmethod
+    def convert_unit_series(cls, units: pd.Series) -> pd.Series:
+        """Convert a column of Spanish units to English"""
+        return _convert_unit_column(units, cls.UNIT_CODES)
+    
     def convert_country_code(self, code: str) -> str:
         """Convert 3-letter to 2-letter ISO country code"""
         if not code or pd.isna(code):
@@ -89,36 +212,29 @@ class AcuityInvoiceAgent:
         if not line_items:
             return []
         
-        # Convert to DataFrame for easier aggregation
-        df = pd.DataFrame(line_items)
-        
-        # Define aggregation rules
-        agg_dict = {
-            'quantity': 'sum',
-            'net_weight': 'sum',
-            'gross_weight': 'sum',
-            'value': 'sum',
-        }
+        return _to_records(self._aggregate_by_sku_df(pd.DataFrame(line_items)))
+    
+    def _aggregate_by_sku_df(self, lines: pd.DataFrame) -> pd.DataFrame:
+        """Aggregate a line item DataFrame by SKU (see aggregate_by_sku)"""
+        sum_cols = ['quantity', 'net_weight', 'gross_weight', 'value']
         
         # Keep first occurrence of non-numeric columns
         non_numeric_cols = ['description', 'hts', 'country_of_origin', 'qty_unit']
-        for col in non_numeric_cols:
-            if col in df.columns:
-                agg_dict[col] = 'first'
+        first_cols = [col for col in non_numeric_cols if col in lines.columns]
         
-        # Group by SKU and aggregate
-        aggregated = df.groupby('sku', as_index=False).agg(agg_dict)
+        # Rows without a SKU are dropped, as in a groupby
+        lines = lines[lines['sku'].notna()]
+        if lines.empty:
+            return pd.DataFrame(columns=['sku'] + sum_cols + first_cols + ['unit_price', 'line_number'])
         
-        # Recalculate unit price based on aggregated values
-        # Unit price = total value / total quantity
-        mask = aggregated['quantity'] > 0
-        aggregated.loc[mask, 'unit_price'] = aggregated.loc[mask, 'value'] / aggregated.loc[mask, 'quantity']
+        # Sum numeric columns, keep first occurrence of non-numeric columns,
+        # and recalculate unit price (total value / total quantity)
+        aggregated = _group_by_sku(lines, sum_cols, first_cols)
         
         # Renumber lines
-        aggregated['line_number'] = range(1, len(aggregated) + 1)
+        aggregated['line_number'] = np.arange(1, len(aggregated['sku']) + 1)
         
-        # Convert back to list of dictionaries
-        return aggregated.to_dict('records')
+        return pd.DataFrame(aggregated)
     
     def clean_numeric(self, value) -> Optional[float]:
         """Clean and convert numeric values"""
@@ -159,184 +275,399 @@ class AcuityInvoiceAgent:
         
         return metadata
     
-    def parse_file(self, file_path: Union[str, Path], aggregate: bool = False) -> Dict:
+    def _read_invoice(self, file_path: Union[str, Path]) -> pd.DataFrame:
+        """
+        Read the metadata and line item columns of an invoice sheet
+        
+        Columns are labelled with their 0-based position in the sheet so
+        COLUMN_MAP indices keep working on the pruned frame.
+        """
+        usecols = sorted(set(self.METADATA_COLUMNS) | set(self.COLUMN_MAP.values()))
+        dtype = {usecols.index(self.COLUMN_MAP[field]): object for field in self.TEXT_FIELDS}
+        return _read_columns(file_path, usecols, dtype)
+    
+    def _load_invoice(self, file_path: Union[str, Path]) -> Tuple[Dict, pd.DataFrame]:
+        """
+        Read an invoice file and return its metadata and line items
+        
+        Re-reading an unchanged file (e.g. once raw, once aggregated) is
+        served from cache. Callers get copies, so changes to the returned
+        metadata or frame never reach the cache.
+        """
+        key = _invoice_cache_key(type(self), file_path)
+        loaded = _get_cached_invoice(key)
+        if loaded is None:
+            loaded = _read_invoice_file(type(self), key[1])
+            _cache_invoice(key, loaded)
+        metadata, lines = loaded
+        return dict(metadata), lines.copy()
+    
+    def _load_invoices(self, file_paths: List[str]) -> List[Tuple[Dict, pd.DataFrame]]:
+        """
+        Batch version of _load_invoice
+        
+        Cache misses are read in parallel in the shared process pool; the
+        results are cached in this process, not in the pool workers.
+        """
+        keys = [_invoice_cache_key(type(self), path) for path in file_paths]
+        loaded = {key: _get_cached_invoice(key) for key in keys}
+        
+        misses = [key for key, entry in loaded.items() if entry is None]
+        if misses:
+            paths = [key[1] for key in misses]
+            for key, entry in zip(misses, _get_pool().map(_read_invoice_file, repeat(type(self)), paths)):
+                _cache_invoice(key, entry)
+                loaded[key] = entry
+        
+        return [(dict(loaded[key][0]), loaded[key][1].copy()) for key in keys]
+    
+    async def _load_invoice_async(self, file_path: Union[str, Path]) -> Tuple[Dict, pd.DataFrame]:
+        """
+        Async version of _load_invoice
+        
+        On a cache miss the file is read in the shared process pool; the
+        result is cached in this process, not in the pool worker.
+        """
+        key = _invoice_cache_key(type(self), file_path)
+        loaded = _get_cached_invoice(key)
+        if loaded is None:
+            loop = asyncio.get_running_loop()
+            loaded = await loop.run_in_executor(_get_pool(), _read_invoice_file, type(self), key[1])
+            _cache_invoice(key, loaded)
+        metadata, lines = loaded
+        return dict(metadata), lines.copy()
+    
+    def _extract_line_items(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Extract line items from the invoice sheet column-wise
+        
+        Args:
+            df: Invoice DataFrame as returned by _read_invoice
+            
+        Returns:
+            DataFrame with one row per line item; missing numerics are NaN
+        """
+        lines = df.loc[:, list(self.COLUMN_MAP.values())]
+        lines = lines.set_axis(list(self.COLUMN_MAP.keys()), axis=1)
+        
+        # Skip rows without SKU
+        sku = _clean_text(lines['sku'])
+        has_sku = sku.ne('')
+        lines = lines.loc[has_sku]
+        
+        def numeric(col: str) -> pd.Series:
+            return pd.to_numeric(lines[col], errors='coerce').astype('float64')
+        
+        items = pd.DataFrame({
+            'line_number': lines.index + 1,
+            'sku': sku[has_sku],
+            'description': _clean_text(lines['description']),
+            'hts': _clean_text(lines['hts']),
+            'country_of_origin': self.convert_country_series(lines['country_of_origin']),
+            'quantity': numeric('quantity'),
+            'qty_unit': self.convert_unit_series(lines['qty_unit']),
+            'net_weight': numeric('net_weight'),
+            'gross_weight': numeric('gross_weight'),
+            'unit_price': numeric('unit_price'),
+            'value': numeric('value'),
+        }, index=lines.index)
+        
+        # Repeated codes are stored once; validation, grouping and distinct
+        # counts then work on the integer category codes
+        return items.astype({col: 'category' for col in self.CATEGORY_FIELDS})
+    
+    def _parse_lines(self, file_path: Union[str, Path]) -> Tuple[pd.DataFrame, Dict, List[Dict]]:
+        """Read an invoice file and return its line items, metadata and validation errors"""
+        # Read Excel file, extracting metadata and line items
+        return self._check_lines(*self._load_invoice(file_path))
+    
+    def _check_lines(self, metadata: Dict, lines: pd.DataFrame) -> Tuple[pd.DataFrame, Dict, List[Dict]]:
+        """Apply the max_items limit and validation to an invoice's line items"""
+        # Check max items limit
+        if self.max_items:
+            lines = lines.head(self.max_items)
+        
+        # Validate if enabled
+        errors = self._validate_lines(lines) if self.validate else []
+        
+        return lines, metadata, errors
+    
+    def parse_file(self, file_path: Union[str, Path], aggregate: bool = False,
+                   as_frame: bool = False) -> Dict:
         """
         Parse Acuity invoice file (synchronous)
         
         Args:
             file_path: Path to XLS file
             aggregate: If True, aggregate line items by SKU
+            as_frame: If True, return 'items' as a DataFrame instead of a list of dicts
             
         Returns:
             Dict with 'items', 'metadata', 'summary', 'errors'
         """
         try:
-            # Read Excel file
-            df = pd.read_excel(str(file_path))
+            lines, self.metadata, errors = self._parse_lines(file_path)
+            return self._build_result(lines, errors, aggregate, as_frame)
             
-            # Extract metadata
-            self.metadata = self.extract_metadata(df)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'timestamp': _utc_timestamp()
+            }
+    
+    async def parse_file_async(self, file_path: Union[str, Path], aggregate: bool = False,
+                               as_frame: bool = False) -> Dict:
+        """
+        Async version of parse_file
+        
+        Reading the sheet is the CPU-bound part, so it runs in a shared
+        process pool; several invoices awaited together are read in parallel
+        across cores. The line items are cached here and validated and
+        aggregated in this process, so re-parsing the same file (e.g. once
+        raw, once aggregated) skips the read.
+        """
+        try:
+            metadata, lines = await self._load_invoice_async(file_path)
+            lines, self.metadata, errors = self._check_lines(metadata, lines)
+            return self._build_result(lines, errors, aggregate, as_frame)
             
-            # Parse line items
-            line_items = []
-            errors = []
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'timestamp': _utc_timestamp()
+            }
+    
+    def _build_result(self, lines: pd.DataFrame, errors: List[Dict], aggregate: bool,
+                      as_frame: bool) -> Dict:
+        """Aggregate and summarize parsed line items into a parse_file result"""
+        # Aggregate by SKU if requested
+        if aggregate:
+            lines = self._aggregate_by_sku_df(lines)
+        
+        # Generate summary
+        summary = self._generate_summary(lines)
+        
+        return {
+            'success': True,
+            'items': lines if as_frame else _to_records(lines),
+            'metadata': self.metadata,
+            'summary': summary,
+            'errors': errors,
+            'aggregated': aggregate,
+            'timestamp': _utc_timestamp()
+        }
+    
+    def parse_files(self, file_paths: List[Union[str, Path]], aggregate: bool = False,
+                    as_frame: bool = False) -> Dict:
+        """
+        Parse a batch of Acuity invoice files in one pass
+        
+        Files not already cached here are read in parallel in the shared
+        process pool, then their line items are concatenated (tagged with a
+        'file' column) so aggregation and the summary run once over the
+        whole batch.
+        
+        Args:
+            file_paths: Paths to XLS files
+            aggregate: If True, aggregate line items by SKU across all files
+            as_frame: If True, return 'items' as a DataFrame instead of a list of dicts
             
-            for idx, row in df.iterrows():
-                # Check max items limit
-                if self.max_items and len(line_items) >= self.max_items:
-                    break
-                
-                # Skip rows without SKU
-                sku = row.iloc[self.COLUMN_MAP['sku']]
-                if pd.isna(sku) or str(sku).strip() == '':
-                    continue
-                
-                try:
-                    # Extract and convert data
-                    item = {
-                        'line_number': idx + 1,
-                        'sku': str(sku).strip(),
-                        'description': str(row.iloc[self.COLUMN_MAP['description']]).strip() 
-                            if not pd.isna(row.iloc[self.COLUMN_MAP['description']]) else '',
-                        'hts': str(row.iloc[self.COLUMN_MAP['hts']]).strip() 
-                            if not pd.isna(row.iloc[self.COLUMN_MAP['hts']]) else '',
-                        'country_of_origin': self.convert_country_code(
-                            row.iloc[self.COLUMN_MAP['country_of_origin']]
-                        ),
-                        'quantity': self.clean_numeric(row.iloc[self.COLUMN_MAP['quantity']]),
-                        'qty_unit': self.convert_unit(row.iloc[self.COLUMN_MAP['qty_unit']]),
-                        'net_weight': self.clean_numeric(row.iloc[self.COLUMN_MAP['net_weight']]),
-                        'gross_weight': self.clean_numeric(row.iloc[self.COLUMN_MAP['gross_weight']]),
-                        'unit_price': self.clean_numeric(row.iloc[self.COLUMN_MAP['unit_price']]),
-                        'value': self.clean_numeric(row.iloc[self.COLUMN_MAP['value']]),
-                    }
-                    
-                    # Validate if enabled
-                    if self.validate:
-                        validation_errors = self._validate_item(item)
-                        if validation_errors:
-                            errors.append({
-                                'line': idx + 1,
-                                'errors': validation_errors
-                            })
-                    
-                    line_items.append(item)
-                    
-                except Exception as e:
-                    errors.append({
-                        'line': idx + 1,
-                        'error': f'Parse error: {str(e)}'
-                    })
+        Returns:
+            Dict with 'items', 'metadata' and 'errors' keyed/tagged by file, and 'summary'
+        """
+        try:
+            paths = [str(path) for path in file_paths]
+            if not paths:
+                raise ValueError('No files to parse')
             
-            # Aggregate by SKU if requested
-            if aggregate:
-                line_items = self.aggregate_by_sku(line_items)
+            parsed = [self._check_lines(*loaded) for loaded in self._load_invoices(paths)]
+            
+            lines = pd.concat([frame for frame, _, _ in parsed], keys=paths, names=['file'])
+            lines = lines.reset_index(level='file').reset_index(drop=True)
+            # Category sets differ per file, so concat falls back to object
+            lines = lines.astype({col: 'category' for col in self.CATEGORY_FIELDS})
             
-            # Generate summary
-            summary = self._generate_summary(line_items)
+            metadata = {path: file_metadata for path, (_, file_metadata, _) in zip(paths, parsed)}
+            errors = [
+                {'file': path, **error}
+                for path, (_, _, file_errors) in zip(paths, parsed)
+                for error in file_errors
+            ]
+            
+            # Aggregate by SKU across the batch if requested
+            if aggregate:
+                lines = self._aggregate_by_sku_df(lines)
             
             return {
                 'success': True,
-                'items': line_items,
-                'metadata': self.metadata,
-                'summary': summary,
+                'items': lines if as_frame else _to_records(lines),
+                'metadata': metadata,
+                'summary': self._generate_summary(lines),
                 'errors': errors,
                 'aggregated': aggregate,
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': _utc_timestamp()
             }
             
         except Exception as e:
             return {
                 'success': False,
                 'error': str(e),
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': _utc_timestamp()
             }
     
-    async def parse_file_async(self, file_path: Union[str, Path], aggregate: bool = False) -> Dict:
-        """Async version of parse_file"""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, lambda: self.parse_file(file_path, aggregate))
-    
-    def _validate_item(self, item: Dict) -> List[str]:
-        """Validate a line item"""
-        errors = []
-        
-        if not item.get('sku'):
-            errors.append('Missing SKU')
+    def _validate_lines(self, lines: pd.DataFrame) -> List[Dict]:
+        """Validate extracted line items, returning errors grouped by line"""
+        quantity = lines['quantity']
+        value = lines['value']
         
-        if not item.get('hts'):
-            errors.append('Missing HTS code')
-        
-        if not item.get('country_of_origin'):
-            errors.append('Missing country of origin')
-        
-        if item.get('quantity') is None:
-            errors.append('Missing quantity')
-        elif item['quantity'] <= 0:
-            errors.append('Invalid quantity (must be > 0)')
+        # Text fields are extracted as '' when missing
+        checks = {
+            'Missing SKU': lines['sku'].eq(''),
+            'Missing HTS code': lines['hts'].eq(''),
+            'Missing country of origin': lines['country_of_origin'].eq(''),
+            'Missing quantity': quantity.isna(),
+            'Invalid quantity (must be > 0)': quantity <= 0,
+            'Missing value': value.isna(),
+            'Invalid value (must be >= 0)': value < 0,
+        }
         
-        if item.get('value') is None:
-            errors.append('Missing value')
-        elif item['value'] < 0:
-            errors.append('Invalid value (must be >= 0)')
+        line_numbers = lines['line_number'].to_numpy()
+        errors_by_line = {}
+        for message, mask in checks.items():
+            for line in line_numbers[mask.to_numpy()]:
+                errors_by_line.setdefault(int(line), []).append(message)
         
-        return errors
+        return [
+            {'line': line, 'errors': errors}
+            for line, errors in sorted(errors_by_line.items())
+        ]
     
-    def _generate_summary(self, items: List[Dict]) -> Dict:
-        """Generate summary statistics"""
-        if not items:
+    def _generate_summary(self, items: Union[List[Dict], pd.DataFrame]) -> Dict:
+        """Generate summary statistics from line item dicts or a line item DataFrame"""
+        if len(items) == 0:
             return {}
         
-        total_qty = sum(item.get('quantity', 0) or 0 for item in items)
-        total_value = sum(item.get('value', 0) or 0 for item in items)
-        total_weight = sum(item.get('net_weight', 0) or 0 for item in items)
+        if isinstance(items, pd.DataFrame):
+            # Column-wise reductions; NaN is skipped like a missing dict value
+            total_qty, total_value, total_weight = np.nansum(
+                items[['quantity', 'value', 'net_weight']].to_numpy(dtype=float), axis=0
+            ).tolist()
+            hts = items['hts']
+            origins = items['country_of_origin']
+            
+            return {
+                'total_items': len(items),
+                'total_quantity': round(total_qty, 2),
+                'total_value': round(total_value, 2),
+                'total_weight_kg': round(total_weight, 2),
+                'unique_skus': items['sku'].nunique(),
+                'unique_hts_codes': hts[hts.ne('')].nunique(),
+                'unique_origins': origins[origins.ne('')].nunique(),
+            }
         
-        unique_skus = len(set(item['sku'] for item in items))
-        unique_hts = len(set(item['hts'] for item in items if item.get('hts')))
-        unique_origins = len(set(item['country_of_origin'] for item in items 
-                                 if item.get('country_of_origin')))
+        # Accumulate totals and distinct values in a single pass
+        total_qty = total_value = total_weight = 0
+        skus, hts_codes, origins = set(), set(), set()
+        
+        for item in items:
+            quantity = item.get('quantity')
+            if quantity:
+                total_qty += quantity
+            value = item.get('value')
+            if value:
+                total_value += value
+            weight = item.get('net_weight')
+            if weight:
+                total_weight += weight
+            
+            skus.add(item['sku'])
+            hts = item.get('hts')
+            if hts:
+                hts_codes.add(hts)
+            origin = item.get('country_of_origin')
+            if origin:
+                origins.add(origin)
         
         return {
             'total_items': len(items),
             'total_quantity': round(total_qty, 2),
             'total_value': round(total_value, 2),
             'total_weight_kg': round(total_weight, 2),
-            'unique_skus': unique_skus,
-            'unique_hts_codes': unique_hts,
-            'unique_origins': unique_origins,
+            'unique_skus': len(skus),
+            'unique_hts_codes': len(hts_codes),
+            'unique_origins': len(origins),
         }
     
     def to_json(self, result: Dict) -> str:
         """Convert result to JSON string"""
-        return json.dumps(result, indent=2)
+        if isinstance(result.get('items'), pd.DataFrame):
+            result = {**result, 'items': _to_records(result['items'])}
+        if orjson is not None:
+            options = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+            return orjson.dumps(result, default=str, option=options).decode()
+        return json.dumps(result, indent=2, default=str)
     
     def to_dataframe(self, result: Dict) -> pd.DataFrame:
         """Convert result items to pandas DataFrame"""
-        if not result.get('items'):
+        items = result.get('items')
+        if isinstance(items, pd.DataFrame):
+            return items
+        if not items:
             return pd.DataFrame()
-        return pd.DataFrame(result['items'])
+        return pd.DataFrame(items)
     
     def export_csv(self, result: Dict, output_path: Union[str, Path]) -> None:
         """Export items to CSV"""
         df = self.to_dataframe(result)
+        
+        if pa is not None:
+            try:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                table = None  # Mixed-type columns; let pandas format them
+            if table is not None:
+                pacsv.write_csv(table, str(output_path))
+                return
+        
         df.to_csv(str(output_path), index=False)
     
     def export_excel(self, result: Dict, output_path: Union[str, Path]) -> None:
         """Export items to Excel with multiple sheets"""
-        df = self.to_dataframe(result)
+        sheets = {'Line Items': self.to_dataframe(result)}
+        
+        # Add metadata sheet
+        if result.get('metadata'):
+            sheets['Metadata'] = pd.DataFrame([result['metadata']])
+        
+        # Add summary sheet
+        if result.get('summary'):
+            sheets['Summary'] = pd.DataFrame([result['summary']])
+        
+        if xlsxwriter is not None:
+            with xlsxwriter.Workbook(str(output_path), _XLSX_OPTIONS) as workbook:
+                header_format = workbook.add_format(_XLSX_HEADER_FORMAT)
+                for name, df in sheets.items():
+                    _write_sheet(workbook, name, df, header_format)
+            return
         
         with pd.ExcelWriter(str(output_path), engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Line Items', index=False)
-            
-            # Add metadata sheet
-            if result.get('metadata'):
-                meta_df = pd.DataFrame([result['metadata']])
-                meta_df.to_excel(writer, sheet_name='Metadata', index=False)
-            
-            # Add summary sheet
-            if result.get('summary'):
-                summary_df = pd.DataFrame([result['summary']])
-                summary_df.to_excel(writer, sheet_name='Summary', index=False)
+            for name, df in sheets.items():
+                df.to_excel(writer, sheet_name=name, index=False)
+
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Return the shared parsing process pool, creating it on first use"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor()
+        return _POOL
 
 
 # Agent Interface for Iqo Layer
@@ -3,11 +3,36 @@ Acuity Invoice Parser
 Extracts line items from Acuity XLS invoices and converts to standardized format
 """
 
+import numpy as np
 import pandas as pd
 import sys
-from typing import Dict, List, Optional
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
 import json
 
+# Prefer the Rust-based calamine reader when installed and supported
+# (pandas >= 2.2); otherwise let pandas pick xlrd/openpyxl from the file extension
+try:
+    import python_calamine  # noqa: F401
+    _PANDAS_VERSION = tuple(int(part) for part in pd.__version__.split('.')[:2])
+    _EXCEL_ENGINE = 'calamine' if _PANDAS_VERSION >= (2, 2) else None
+except ImportError:
+    _EXCEL_ENGINE = None
+
+# Optional JIT-compiled aggregation kernel for very large invoices
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Below this many line items the numpy path beats the JIT dispatch overhead
+_NUMBA_MIN_ITEMS = 5000
+
+# Rust-based JSON encoder; falls back to the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # Country code conversion mapping (Spanish 3-letter to ISO 2-letter)
 COUNTRY_CODE_MAP = {
@@ -50,6 +75,106 @@ UNIT_CONVERSION_MAP = {
 }
 
 
+if njit is not None:
+    @njit(cache=True)
+    def _sum_by_group(group_ids: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+        """Sum each column of values per group id in one pass, skipping NaN"""
+        sums = np.zeros((n_groups, values.shape[1]))
+        for i in range(group_ids.shape[0]):
+            for j in range(values.shape[1]):
+                if not np.isnan(values[i, j]):
+                    sums[group_ids[i], j] += values[i, j]
+        return sums
+else:
+    _sum_by_group = None
+
+
+def _clean_text(values: pd.Series) -> pd.Series:
+    """Stringify and strip a column in one pass, with '' for missing cells"""
+    return values.astype('string').str.strip().fillna('')
+
+
+def _lookup_table(mapping: Dict[str, str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Build sorted key/value arrays for vectorized code lookups"""
+    keys = sorted(mapping)
+    return np.array(keys), np.array([mapping[key] for key in keys])
+
+
+def _map_codes(table: Tuple[np.ndarray, np.ndarray], codes: np.ndarray) -> np.ndarray:
+    """Map an array of codes through a lookup table, keeping unknown codes as-is"""
+    keys, values = table
+    if len(keys) == 0:
+        return codes
+    idx = np.searchsorted(keys, codes).clip(max=len(keys) - 1)
+    return np.where(keys[idx] == codes, values[idx], codes)
+
+
+# The lookup tables are built from the mapping on every column conversion
+# (a few dozen keys), so additions to the mappings are always picked up
+
+def _convert_country_column(codes: pd.Series, mapping: Dict[str, str]) -> pd.Series:
+    """Convert a column of country codes through mapping, keeping 2-letter codes"""
+    upper = _clean_text(codes).str.upper().to_numpy(dtype=str)
+    
+    # If already 2 letters, keep as-is; otherwise look up in mapping
+    converted = np.where(np.char.str_len(upper) == 2, upper, _map_codes(_lookup_table(mapping), upper))
+    return pd.Series(converted, index=codes.index, dtype=object)
+
+
+def _convert_unit_column(units: pd.Series, mapping: Dict[str, str]) -> pd.Series:
+    """Convert a column of unit codes through mapping"""
+    upper = _clean_text(units).str.upper().to_numpy(dtype=str)
+    return pd.Series(_map_codes(_lookup_table(mapping), upper), index=units.index, dtype=object)
+
+
+# Column mapping (0-indexed)
+COLUMN_MAPPING = {
+    'sku': 19,              # T: Numero_de_parte
+    'description': 23,      # X: Descripcion_Ingles
+    'hts': 42,              # AQ: HTS
+    'country_of_origin': 38, # AM: Origen
+    'quantity': 20,         # U: Cantidad
+    'net_weight': 33,       # AH: Neto
+    'gross_weight': 34,     # AI: Bruto
+    'unit_price': 25,       # Z: Costo_unitario
+    'value': 28,            # AC: Valor_de_partida
+    'qty_unit': 21,         # V: UM
+}
+
+# Only the mapped columns are read; text columns skip per-cell type inference
+_USECOLS = sorted(COLUMN_MAPPING.values())
+_TEXT_FIELDS = ('sku', 'description', 'hts', 'country_of_origin', 'qty_unit')
+_DTYPES = {_USECOLS.index(COLUMN_MAPPING[field]): object for field in _TEXT_FIELDS}
+
+
+def _read_columns(file_path: Union[str, BinaryIO], usecols: List[int], dtype: Dict) -> pd.DataFrame:
+    """
+    Read the given columns of an invoice sheet, labelled by their 0-based position
+    
+    Raises:
+        ValueError: If the sheet is narrower than the last requested column
+    """
+    try:
+        df = pd.read_excel(file_path, engine=_EXCEL_ENGINE, usecols=usecols, dtype=dtype)
+    except pd.errors.ParserError as e:
+        if 'usecols' not in str(e):
+            raise
+        raise ValueError(
+            f'Not an Acuity invoice: expected at least {max(usecols) + 1} columns'
+        ) from None
+    return df.set_axis(usecols, axis=1)
+
+
+def convert_country_series(country_codes: pd.Series) -> pd.Series:
+    """Convert a column of 3-letter country codes to 2-letter ISO codes"""
+    return _convert_country_column(country_codes, COUNTRY_CODE_MAP)
+
+
+def convert_unit_series(units: pd.Series) -> pd.Series:
+    """Convert a column of Spanish units to English equivalents"""
+    return _convert_unit_column(units, UNIT_CONVERSION_MAP)
+
+
 def convert_country_code(country_code: str) -> str:
     """Convert 3-letter country code to 2-letter ISO code"""
     if not country_code or pd.isna(country_code):
@@ -97,31 +222,65 @@ def aggregate_by_sku(line_items: List[Dict]) -> List[Dict]:
     if not line_items:
         return []
     
-    # Convert to DataFrame for easier aggregation
-    df = pd.DataFrame(line_items)
+    return _aggregate_by_sku_df(pd.DataFrame(line_items)).to_dict('records')
+
+
+def _group_by_sku(lines: pd.DataFrame, sum_cols: List[str], first_cols: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Group line items (all with a SKU) by SKU, in SKU order
     
-    # Define aggregation rules
-    agg_dict = {
-        'quantity': 'sum',
-        'net_weight': 'sum',
-        'gross_weight': 'sum',
-        'value': 'sum',
-    }
+    Returns column arrays: the SKU, sum_cols summed per group (missing
+    values count as 0; integer columns give integer sums), first_cols from each group's first occurrence,
+    and unit_price recalculated as value / quantity.
+    """
+    # Integer group ids in SKU order (cheap for categorical SKUs)
+    group_ids, group_skus = pd.factorize(lines['sku'], sort=True)
+    values = lines[sum_cols].to_numpy(dtype=float)
+
+    if _sum_by_group is not None and len(lines) > _NUMBA_MIN_ITEMS:
+        # Single compiled pass over the group ids
+        _, first = np.unique(group_ids, return_index=True)
+        sums = _sum_by_group(group_ids, values, len(group_skus))
+    else:
+        # Sort by group (stable, so each group starts with its first occurrence)
+        order = np.argsort(group_ids, kind='stable')
+        starts = np.flatnonzero(np.r_[True, np.diff(group_ids[order]) != 0])
+        first = order[starts]
+        sorted_values = values[order]
+        sums = np.add.reduceat(np.where(np.isnan(sorted_values), 0.0, sorted_values), starts)
 
-    # Keep first occurrence of non-numeric columns
+    grouped = {'sku': lines['sku'].iloc[first].to_numpy(dtype=object)}
+    for j, col in enumerate(sum_cols):
+        # Integer columns stay integer, as with a groupby sum (exact: the
+        # sums are whole numbers well within float precision)
+        if pd.api.types.is_integer_dtype(lines[col]):
+            grouped[col] = sums[:, j].astype(np.int64)
+        else:
+            grouped[col] = sums[:, j]
+    for col in first_cols:
+        grouped[col] = lines[col].iloc[first].to_numpy(dtype=object)
+
+    quantity, value = grouped['quantity'], grouped['value']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        grouped['unit_price'] = np.where(quantity > 0, value / quantity, np.nan)
+    return grouped
+
+
+def _aggregate_by_sku_df(lines: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate a line item DataFrame by SKU (see aggregate_by_sku)"""
+    # Rows without a SKU are dropped, as in a groupby
+    lines = lines[lines['sku'].notna()]
+    if lines.empty:
+        return lines
+    
+    # Sum numeric columns, keep first occurrence of non-numeric columns,
+    # and recalculate unit price from the aggregated values
+    sum_cols = ['quantity', 'net_weight', 'gross_weight', 'value']
     non_numeric_cols = ['description', 'hts', 'country_of_origin', 'qty_unit',
                         'no_of_package', 'package_type', 'container_number',
                         'po_number', 'po_reference']
-    for col in non_numeric_cols:
-        if col in df.columns:
-            agg_dict[col] = 'first'
-
-    # Group by SKU and aggregate
-    aggregated = df.groupby('sku', as_index=False).agg(agg_dict)
-
-    # Recalculate unit price based on aggregated values
-    mask = aggregated['quantity'] > 0
-    aggregated.loc[mask, 'unit_price'] = aggregated.loc[mask, 'value'] / aggregated.loc[mask, 'quantity']
+    first_cols = [col for col in non_numeric_cols if col in lines.columns]
+    aggregated = _group_by_sku(lines, sum_cols, first_cols)
 
     # Reorder columns to match Invoice Tab template
     correct_column_order = [
@@ -129,76 +288,80 @@ def aggregate_by_sku(line_items: List[Dict]) -> List[Dict]:
         'quantity', 'net_weight', 'gross_weight', 'unit_price', 'value',
         'qty_unit', 'package_type', 'container_number', 'po_number', 'po_reference'
     ]
-    existing_columns = [col for col in correct_column_order if col in aggregated.columns]
-    aggregated = aggregated[existing_columns]
+    existing_columns = [col for col in correct_column_order if col in aggregated]
 
-    return aggregated.to_dict('records')
+    return pd.DataFrame({col: aggregated[col] for col in existing_columns})
 
 
-def parse_acuity_invoice(file_path: str, aggregate: bool = False) -> List[Dict]:
+def _extract_line_items(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Extract line items from the invoice sheet column-wise
+    
+    Args:
+        df: Invoice DataFrame with columns labelled by sheet position
+        
+    Returns:
+        DataFrame with one row per line item (ordered per Invoice Tab template)
+    """
+    lines = df.loc[:, list(COLUMN_MAPPING.values())]
+    lines = lines.set_axis(list(COLUMN_MAPPING.keys()), axis=1)
+    
+    # Skip rows without SKU
+    sku = _clean_text(lines['sku'])
+    has_sku = sku.ne('')
+    lines = lines.loc[has_sku]
+    
+    def numeric(col: str) -> pd.Series:
+        return pd.to_numeric(lines[col], errors='coerce').astype('float64')
+    
+    items = pd.DataFrame({
+        'sku': sku[has_sku],
+        'description': _clean_text(lines['description']),
+        'hts': _clean_text(lines['hts']),
+        'country_of_origin': convert_country_series(lines['country_of_origin']),
+        'no_of_package': '',
+        'quantity': numeric('quantity'),
+        'net_weight': numeric('net_weight'),
+        'gross_weight': numeric('gross_weight'),
+        'unit_price': numeric('unit_price'),
+        'value': numeric('value'),
+        'qty_unit': convert_unit_series(lines['qty_unit']),
+        'package_type': '',
+        'container_number': '',
+        'po_number': '',
+        'po_reference': '',
+    }, index=lines.index)
+    
+    return items.astype(object).where(items.notna(), None)
+
+
+def parse_acuity_invoice(file_path: Union[str, BinaryIO], aggregate: bool = False) -> List[Dict]:
     """
     Parse Acuity invoice XLS file and extract line items
     
     Args:
-        file_path: Path to the Acuity invoice XLS file
+        file_path: Path to the Acuity invoice XLS file, or a binary file object
         aggregate: If True, aggregate line items by SKU
         
     Returns:
         List of dictionaries containing parsed line items
     """
     try:
-        # Read the Excel file
-        df = pd.read_excel(file_path)
+        # File objects (e.g. an upload stream) may already have been read from
+        if hasattr(file_path, 'seek'):
+            file_path.seek(0)
         
-        # Column mapping (0-indexed)
-        column_mapping = {
-            'sku': 19,              # T: Numero_de_parte
-            'description': 23,      # X: Descripcion_Ingles
-            'hts': 42,              # AQ: HTS
-            'country_of_origin': 38, # AM: Origen
-            'quantity': 20,         # U: Cantidad
-            'net_weight': 33,       # AH: Neto
-            'gross_weight': 34,     # AI: Bruto
-            'unit_price': 25,       # Z: Costo_unitario
-            'value': 28,            # AC: Valor_de_partida
-            'qty_unit': 21,         # V: UM
-        }
+        # Read the Excel file
+        df = _read_columns(file_path, _USECOLS, _DTYPES)
         
         # Extract line items
-        line_items = []
-        
-        for idx, row in df.iterrows():
-            # Skip rows without SKU
-            sku = row.iloc[column_mapping['sku']]
-            if pd.isna(sku) or str(sku).strip() == '':
-                continue
-            
-            # Extract and convert data (ordered per Invoice Tab template)
-            line_item = {
-                'sku': str(sku).strip(),
-                'description': str(row.iloc[column_mapping['description']]).strip() if not pd.isna(row.iloc[column_mapping['description']]) else '',
-                'hts': str(row.iloc[column_mapping['hts']]).strip() if not pd.isna(row.iloc[column_mapping['hts']]) else '',
-                'country_of_origin': convert_country_code(row.iloc[column_mapping['country_of_origin']]),
-                'no_of_package': '',
-                'quantity': clean_value(row.iloc[column_mapping['quantity']]),
-                'net_weight': clean_value(row.iloc[column_mapping['net_weight']]),
-                'gross_weight': clean_value(row.iloc[column_mapping['gross_weight']]),
-                'unit_price': clean_value(row.iloc[column_mapping['unit_price']]),
-                'value': clean_value(row.iloc[column_mapping['value']]),
-                'qty_unit': convert_unit(row.iloc[column_mapping['qty_unit']]),
-                'package_type': '',
-                'container_number': '',
-                'po_number': '',
-                'po_reference': '',
-            }
-            
-            line_items.append(line_item)
+        lines = _extract_line_items(df)
         
         # Aggregate by SKU if requested
         if aggregate:
-            line_items = aggregate_by_sku(line_items)
+            lines = _aggregate_by_sku_df(lines)
         
-        return line_items
+        return lines.to_dict('records')
         
     except Exception as e:
         print(f"Error parsing invoice: {str(e)}", file=sys.stderr)
@@ -218,7 +381,10 @@ def main():
         line_items = parse_acuity_invoice(file_path, aggregate=aggregate)
         
         # Output as JSON
-        print(json.dumps(line_items, indent=2))
+        if orjson is not None:
+            print(orjson.dumps(line_items, option=orjson.OPT_INDENT_2).decode())
+        else:
+            print(json.dumps(line_items, indent=2))
         
         agg_msg = " (aggregated by SKU)" if aggregate else ""
         print(f"\n✓ Successfully parsed {len(line_items)} line items{agg_msg}", file=sys.stderr)
@@ -3,451 +3,252 @@ Acuity Invoice Parser - Flask Web UI
 Simple web interface for uploading and parsing Acuity invoices
 """
 
-from flask import Flask, render_template_string, request, jsonify, send_file
-import os
+from flask import Flask, Response, request, jsonify, send_file, send_from_directory
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import gzip
+import hashlib
 import json
-from werkzeug.utils import secure_filename
+import os
+import threading
+import time
+from urllib.parse import unquote
 import pandas as pd
 from acuity_invoice_parser import parse_acuity_invoice
+# Workbook options and header style shared with the agent's Excel export
+from acuity_invoice_agent import _XLSX_HEADER_FORMAT, _XLSX_OPTIONS
 import io
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+try:
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import gevent
+    import gevent.monkey
+except ImportError:
+    gevent = None
+
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-app.config['UPLOAD_FOLDER'] = '/tmp/acuity_uploads'
-
-# Ensure upload folder exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-HTML_TEMPLATE = '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Acuity Invoice Parser</title>
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            padding: 20px;
-        }
-        .container {
-            max-width: 1200px;
-            margin: 0 auto;
-            background: white;
-            border-radius: 12px;
-            box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-            overflow: hidden;
-        }
-        .header {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 30px;
-            text-align: center;
-        }
-        .header h1 { font-size: 28px; margin-bottom: 10px; }
-        .header p { opacity: 0.9; font-size: 14px; }
-        .content { padding: 30px; }
-        .upload-section {
-            border: 3px dashed #667eea;
-            border-radius: 8px;
-            padding: 40px;
-            text-align: center;
-            background: #f8f9ff;
-            margin-bottom: 30px;
-            cursor: pointer;
-            transition: all 0.3s;
-        }
-        .upload-section:hover { background: #f0f2ff; border-color: #764ba2; }
-        .upload-section.dragover { background: #e8ebff; border-color: #667eea; transform: scale(1.02); }
-        .file-input { display: none; }
-        .upload-icon { font-size: 48px; margin-bottom: 15px; }
-        .btn {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            border: none;
-            padding: 12px 30px;
-            border-radius: 6px;
-            cursor: pointer;
-            font-size: 16px;
-            font-weight: 600;
-            transition: transform 0.2s;
-            display: inline-block;
-            text-decoration: none;
-        }
-        .btn:hover { transform: translateY(-2px); box-shadow: 0 4px 12px rgba(102,126,234,0.4); }
-        .btn:disabled { opacity: 0.5; cursor: not-allowed; transform: none; }
-        .results { display: none; }
-        .stats {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 15px;
-            margin-bottom: 20px;
-        }
-        .stat-card {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 20px;
-            border-radius: 8px;
-            text-align: center;
-        }
-        .stat-card .value { font-size: 32px; font-weight: bold; margin-bottom: 5px; }
-        .stat-card .label { font-size: 14px; opacity: 0.9; }
-        .table-container {
-            overflow-x: auto;
-            border: 1px solid #e0e0e0;
-            border-radius: 8px;
-            margin-top: 20px;
-        }
-        table {
-            width: 100%;
-            border-collapse: collapse;
-            font-size: 14px;
-        }
-        th {
-            background: #f5f5f5;
-            padding: 12px;
-            text-align: left;
-            font-weight: 600;
-            border-bottom: 2px solid #e0e0e0;
-            position: sticky;
-            top: 0;
-        }
-        td {
-            padding: 10px 12px;
-            border-bottom: 1px solid #f0f0f0;
-        }
-        tr:hover { background: #f9f9f9; }
-        .loading {
-            display: none;
-            text-align: center;
-            padding: 40px;
-        }
-        .spinner {
-            border: 4px solid #f3f3f3;
-            border-top: 4px solid #667eea;
-            border-radius: 50%;
-            width: 50px;
-            height: 50px;
-            animation: spin 1s linear infinite;
-            margin: 0 auto 20px;
-        }
-        @keyframes spin {
-            0% { transform: rotate(0deg); }
-            100% { transform: rotate(360deg); }
-        }
-        .error {
-            background: #fee;
-            border: 1px solid #fcc;
-            color: #c00;
-            padding: 15px;
-            border-radius: 6px;
-            margin-bottom: 20px;
-            display: none;
-        }
-        .success {
-            background: #efe;
-            border: 1px solid #cfc;
-            color: #060;
-            padding: 15px;
-            border-radius: 6px;
-            margin-bottom: 20px;
-        }
-        .action-buttons {
-            display: flex;
-            gap: 10px;
-            margin-bottom: 20px;
-            flex-wrap: wrap;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>🏢 Acuity Invoice Parser</h1>
-            <p>Upload Acuity XLS invoices to extract and convert line items</p>
-        </div>
-        
-        <div class="content">
-            <div class="error" id="error"></div>
-            
-            <div class="upload-section" id="uploadSection">
-                <div class="upload-icon">📄</div>
-                <h3>Drop your Acuity invoice here or click to browse</h3>
-                <p style="margin-top: 10px; color: #666;">Supported formats: .xls, .xlsx</p>
-                <input type="file" id="fileInput" class="file-input" accept=".xls,.xlsx">
-                <div style="margin-top: 20px;">
-                    <label style="display: flex; align-items: center; justify-content: center; gap: 8px; cursor: pointer;">
-                        <input type="checkbox" id="noAggregateCheckbox" style="width: 18px; height: 18px; cursor: pointer;">
-                        <span style="font-size: 14px; font-weight: 600;">Keep all line items (no aggregation)</span>
-                    </label>
-                    <p style="margin-top: 5px; color: #666; font-size: 12px;">Uncheck to aggregate duplicate SKUs by default</p>
-                </div>
-            </div>
-            
-            <div class="loading" id="loading">
-                <div class="spinner"></div>
-                <p>Parsing invoice...</p>
-            </div>
-            
-            <div class="results" id="results">
-                <div class="success">
-                    ✓ Successfully parsed <strong id="itemCount">0</strong> line items
-                </div>
-                
-                <div class="stats">
-                    <div class="stat-card">
-                        <div class="value" id="totalItems">0</div>
-                        <div class="label">Total Items</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="value" id="totalQuantity">0</div>
-                        <div class="label">Total Quantity</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="value" id="totalValue">$0</div>
-                        <div class="label">Total Value</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="value" id="totalWeight">0</div>
-                        <div class="label">Total Weight (kg)</div>
-                    </div>
-                </div>
-                
-                <div class="action-buttons">
-                    <button class="btn" onclick="downloadJSON()">Download JSON</button>
-                    <button class="btn" onclick="downloadCSV()">Download CSV</button>
-                    <button class="btn" onclick="downloadExcel()">Download Excel</button>
-                    <button class="btn" onclick="location.reload()">Parse Another</button>
-                </div>
-                
-                <div class="table-container">
-                    <table id="resultsTable">
-                        <thead>
-                            <tr>
-                                <th>SKU</th>
-                                <th>Description</th>
-                                <th>HTS</th>
-                                <th>Country of Origin</th>
-                                <th>No. of Package</th>
-                                <th>Quantity</th>
-                                <th>Net Weight</th>
-                                <th>Gross Weight</th>
-                                <th>Unit Price</th>
-                                <th>Value</th>
-                                <th>Qty Unit</th>
-                                <th>Package Type</th>
-                                <th>Container Number</th>
-                                <th>PO Number</th>
-                                <th>PO Reference</th>
-                            </tr>
-                        </thead>
-                        <tbody id="resultsBody"></tbody>
-                    </table>
-                </div>
-            </div>
-        </div>
-    </div>
-    
-    <script>
-        let parsedData = [];
-        
-        const uploadSection = document.getElementById('uploadSection');
-        const fileInput = document.getElementById('fileInput');
-        const loading = document.getElementById('loading');
-        const results = document.getElementById('results');
-        const errorDiv = document.getElementById('error');
-        
-        uploadSection.addEventListener('click', () => fileInput.click());
-        
-        uploadSection.addEventListener('dragover', (e) => {
-            e.preventDefault();
-            uploadSection.classList.add('dragover');
-        });
-        
-        uploadSection.addEventListener('dragleave', () => {
-            uploadSection.classList.remove('dragover');
-        });
-        
-        uploadSection.addEventListener('drop', (e) => {
-            e.preventDefault();
-            uploadSection.classList.remove('dragover');
-            if (e.dataTransfer.files.length) {
-                handleFile(e.dataTransfer.files[0]);
-            }
-        });
-        
-        fileInput.addEventListener('change', (e) => {
-            if (e.target.files.length) {
-                handleFile(e.target.files[0]);
-            }
-        });
-        
-        async function handleFile(file) {
-            if (!file.name.endsWith('.xls') && !file.name.endsWith('.xlsx')) {
-                showError('Please upload a .xls or .xlsx file');
-                return;
-            }
-            
-            const formData = new FormData();
-            formData.append('file', file);
-            
-            // Aggregate by default unless "no aggregation" is checked
-            const noAggregateCheckbox = document.getElementById('noAggregateCheckbox');
-            if (!noAggregateCheckbox || !noAggregateCheckbox.checked) {
-                formData.append('aggregate', 'true');
-            }
-            
-            uploadSection.style.display = 'none';
-            loading.style.display = 'block';
-            errorDiv.style.display = 'none';
-            
-            try {
-                const response = await fetch('/parse', {
-                    method: 'POST',
-                    body: formData
-                });
-                
-                const data = await response.json();
-                
-                if (!response.ok) {
-                    throw new Error(data.error || 'Upload failed');
-                }
-                
-                parsedData = data.items;
-                displayResults(data.items);
-                
-            } catch (error) {
-                showError(error.message);
-                uploadSection.style.display = 'block';
-            } finally {
-                loading.style.display = 'none';
-            }
-        }
-        
-        function displayResults(items) {
-            const totalQty = items.reduce((sum, item) => sum + (item.quantity || 0), 0);
-            const totalVal = items.reduce((sum, item) => sum + (item.value || 0), 0);
-            const totalWt = items.reduce((sum, item) => sum + (item.net_weight || 0), 0);
-            
-            document.getElementById('itemCount').textContent = items.length;
-            document.getElementById('totalItems').textContent = items.length;
-            document.getElementById('totalQuantity').textContent = totalQty.toFixed(0);
-            document.getElementById('totalValue').textContent = '$' + totalVal.toFixed(2);
-            document.getElementById('totalWeight').textContent = totalWt.toFixed(2);
-            
-            const tbody = document.getElementById('resultsBody');
-            tbody.innerHTML = items.map(item => `
-                <tr>
-                    <td>${item.sku}</td>
-                    <td>${item.description}</td>
-                    <td>${item.hts}</td>
-                    <td>${item.country_of_origin}</td>
-                    <td>${item.no_of_package || ''}</td>
-                    <td>${item.quantity?.toFixed(0) || ''}</td>
-                    <td>${item.net_weight?.toFixed(2) || ''}</td>
-                    <td>${item.gross_weight?.toFixed(2) || ''}</td>
-                    <td>$${item.unit_price?.toFixed(2) || ''}</td>
-                    <td>$${item.value?.toFixed(2) || ''}</td>
-                    <td>${item.qty_unit}</td>
-                    <td>${item.package_type || ''}</td>
-                    <td>${item.container_number || ''}</td>
-                    <td>${item.po_number || ''}</td>
-                    <td>${item.po_reference || ''}</td>
-                </tr>
-            `).join('');
-            
-            results.style.display = 'block';
-        }
-        
-        function showError(message) {
-            errorDiv.textContent = '✗ Error: ' + message;
-            errorDiv.style.display = 'block';
-        }
-        
-        function downloadJSON() {
-            const blob = new Blob([JSON.stringify(parsedData, null, 2)], { type: 'application/json' });
-            downloadBlob(blob, 'acuity_invoice.json');
-        }
-        
-        async function downloadCSV() {
-            const response = await fetch('/export/csv', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ items: parsedData })
-            });
-            const blob = await response.blob();
-            downloadBlob(blob, 'acuity_invoice.csv');
-        }
-        
-        async function downloadExcel() {
-            const response = await fetch('/export/excel', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ items: parsedData })
-            });
-            const blob = await response.blob();
-            downloadBlob(blob, 'acuity_invoice.xlsx');
-        }
-        
-        function downloadBlob(blob, filename) {
-            const url = URL.createObjectURL(blob);
-            const a = document.createElement('a');
-            a.href = url;
-            a.download = filename;
-            document.body.appendChild(a);
-            a.click();
-            document.body.removeChild(a);
-            URL.revokeObjectURL(url);
-        }
-    </script>
-</body>
-</html>
-'''
+
+ALLOWED_EXTENSIONS = ('.xls', '.xlsx')
+
+# Compress JSON and CSV responses when flask-compress is installed
+if Compress is not None:
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    app.config['COMPRESS_MIMETYPES'] = ['text/html', 'application/json', 'text/csv']
+    app.config['COMPRESS_MIN_SIZE'] = 500
+    Compress(app)
+
+# The page is a plain static file; compressed copies are built once up
+# front (flask-compress skips responses that already have a Content-Encoding)
+with open(os.path.join(app.static_folder, 'index.html'), 'rb') as f:
+    _INDEX_BODY = f.read()
+_INDEX_ETAG = hashlib.blake2b(_INDEX_BODY, digest_size=16).hexdigest()
+_INDEX_ENCODED = {'gzip': gzip.compress(_INDEX_BODY, compresslevel=9)}
+if brotli is not None:
+    _INDEX_ENCODED['br'] = brotli.compress(_INDEX_BODY, quality=11)
+
 
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    encoding = next(
+        (enc for enc in ('br', 'gzip') if enc in _INDEX_ENCODED and request.accept_encodings[enc]),
+        None
+    )
+    if encoding is None:
+        # Conditional response (ETag / Last-Modified) straight from the file
+        response = send_from_directory(app.static_folder, 'index.html', max_age=3600)
+        response.vary.add('Accept-Encoding')
+        return response
+    
+    etag = f'{_INDEX_ETAG}-{encoding}'
+    headers = {
+        'ETag': f'"{etag}"',
+        'Cache-Control': 'public, max-age=3600',
+        'Vary': 'Accept-Encoding',
+        'Content-Encoding': encoding,
+    }
+    if etag in request.if_none_match:
+        return Response(status=304, headers=headers)
+    return Response(_INDEX_ENCODED[encoding], mimetype='text/html', headers=headers)
+
+
+def _json_response(payload):
+    """JSON response via orjson when available (NaN becomes null), else jsonify"""
+    if orjson is None:
+        return jsonify(payload)
+    body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return Response(body, mimetype='application/json')
+
+
+def _dumps(obj):
+    """Encode an object as JSON bytes"""
+    if orjson is None:
+        return json.dumps(obj).encode('utf-8')
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+# Items encoded per chunk of a streamed /parse response
+_JSON_CHUNK_ITEMS = 1000
+
+
+def _parse_response(items, aggregate):
+    """Stream the /parse result, encoding items a chunk at a time"""
+    def generate():
+        yield b'{"count":%d,"aggregated":%s,"items":[' % (len(items), b'true' if aggregate else b'false')
+        for start in range(0, len(items), _JSON_CHUNK_ITEMS):
+            # Encode the slice as a list and drop its brackets
+            chunk = _dumps(items[start:start + _JSON_CHUNK_ITEMS])[1:-1]
+            yield chunk if start == 0 else b',' + chunk
+        yield b']}'
+    
+    return Response(generate(), mimetype='application/json')
+
+
+def _loads(body):
+    """Decode a JSON request body"""
+    if orjson is None:
+        return json.loads(body)
+    return orjson.loads(body)
+
+
+class _TTLCache:
+    """Small thread-safe LRU cache whose entries expire after ttl seconds"""
+    
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+@app.errorhandler(413)
+def _too_large(error=None):
+    max_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    return _json_response({'error': f'File too large (max {max_mb}MB)'}), 413
+
+
+@app.before_request
+def _guard_upload():
+    """Reject oversized or unsupported uploads before the body is read"""
+    if request.path != '/parse':
+        return None
+    
+    max_length = app.config['MAX_CONTENT_LENGTH']
+    if request.content_length and request.content_length > max_length:
+        return _too_large()
+    
+    filename = unquote(request.headers.get('X-Filename', ''))
+    if filename and not filename.endswith(ALLOWED_EXTENSIONS):
+        return _json_response({'error': 'Only .xls and .xlsx files are supported'}), 400
+    return None
+
+
+# Parsing is CPU-bound, so it runs in a per-worker process pool instead of
+# holding the request thread
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+# Re-uploading the same file (e.g. with and without aggregation) skips parsing
+_parse_cache = _TTLCache(maxsize=32, ttl=600)
+
+
+def _get_parse_pool():
+    """Return the parsing process pool, creating it on first use"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # One process per web worker unless configured; gunicorn runs
+            # several web workers, each with its own pool (see gunicorn.conf.py)
+            max_workers = int(os.environ.get('PARSE_WORKERS', 1))
+            _parse_pool = ProcessPoolExecutor(max_workers=max_workers)
+        return _parse_pool
+
+
+def _run_parse(upload, aggregate):
+    """Parse an upload off the request thread and return its line items"""
+    if gevent is not None and gevent.monkey.is_module_patched('threading'):
+        # Under gevent workers the executor's helper threads are greenlets, and
+        # a blocking pipe write of a large upload or result freezes the whole
+        # worker; parse in one of gevent's native threads instead
+        return gevent.get_hub().threadpool.apply(parse_acuity_invoice, (upload, aggregate))
+    
+    # The upload is sent to the child as bytes, so no file is written or
+    # shared between processes
+    return _get_parse_pool().submit(parse_acuity_invoice, upload, aggregate).result()
 
 
 @app.route('/parse', methods=['POST'])
 def parse_invoice():
     try:
         if 'file' not in request.files:
-            return jsonify({'error': 'No file uploaded'}), 400
+            return _json_response({'error': 'No file uploaded'}), 400
         
         file = request.files['file']
         
         if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+            return _json_response({'error': 'No file selected'}), 400
         
-        if not file.filename.endswith(('.xls', '.xlsx')):
-            return jsonify({'error': 'Only .xls and .xlsx files are supported'}), 400
+        if not file.filename.endswith(ALLOWED_EXTENSIONS):
+            return _json_response({'error': 'Only .xls and .xlsx files are supported'}), 400
         
         # Check if aggregation is requested
         aggregate = request.form.get('aggregate', '').lower() == 'true'
         
-        # Save file temporarily
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        # Parse the invoice
-        items = parse_acuity_invoice(filepath, aggregate=aggregate)
+        data = file.read()
+        key = (hashlib.blake2b(data, digest_size=16).digest(), aggregate)
+        items = _parse_cache.get(key)
         
-        # Clean up temp file
-        os.remove(filepath)
+        if items is None:
+            items = _run_parse(io.BytesIO(data), aggregate)
+            _parse_cache.put(key, items)
         
-        return jsonify({
-            'items': items, 
-            'count': len(items),
-            'aggregated': aggregate
-        })
+        return _parse_response(items, aggregate)
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _json_response({'error': str(e)}), 500
 
 
 # Column order and display names matching Invoice Tab template
@@ -464,51 +265,102 @@ EXPORT_COLUMN_NAMES = {
     'package_type': 'PACKAGE TYPE', 'container_number': 'CONTAINER NUMBER',
     'po_number': 'PO NUMBER', 'po_reference': 'PO REFERENCE'
 }
+EXPORT_COLUMN_LABELS = [EXPORT_COLUMN_NAMES[col] for col in EXPORT_COLUMN_ORDER]
+EXPORT_NUMERIC_COLUMNS = {'quantity', 'net_weight', 'gross_weight', 'unit_price', 'value'}
+
+if pa is not None:
+    _EXPORT_SCHEMA = pa.schema([
+        (col, pa.float64() if col in EXPORT_NUMERIC_COLUMNS else pa.string())
+        for col in EXPORT_COLUMN_ORDER
+    ])
 
 
 def _prepare_export_df(items):
     """Prepare a DataFrame with correct column order and names for export."""
-    df = pd.DataFrame(items)
-    cols = [c for c in EXPORT_COLUMN_ORDER if c in df.columns]
-    df = df[cols]
-    df = df.rename(columns=EXPORT_COLUMN_NAMES)
+    df = pd.DataFrame(items, columns=EXPORT_COLUMN_ORDER)
+    df.columns = EXPORT_COLUMN_LABELS
     return df
 
 
+def _prepare_export(items):
+    """
+    Prepare export rows, as a pyarrow Table when possible
+    
+    The Table is built column-wise in C against a fixed schema; items
+    with values that don't fit it go through pandas instead.
+    """
+    if pa is not None:
+        try:
+            table = pa.Table.from_pylist(items, schema=_EXPORT_SCHEMA)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+        else:
+            return table.rename_columns(EXPORT_COLUMN_LABELS)
+    return _prepare_export_df(items)
+
+
+def _is_table(export):
+    return pa is not None and isinstance(export, pa.Table)
+
+
+def _request_export():
+    """Export rows for the items in the request's JSON body"""
+    return _prepare_export(_loads(request.get_data(cache=False)).get('items', []))
+
+
+def _export_rows(export):
+    """Iterate export rows as tuples, with None for missing values"""
+    if _is_table(export):
+        return zip(*(column.to_pylist() for column in export.columns))
+    return export.astype(object).where(export.notna(), None).itertuples(index=False, name=None)
+
+
+def _write_xlsx(output, export):
+    """Write the export sheet row by row with xlsxwriter in constant memory mode"""
+    with xlsxwriter.Workbook(output, _XLSX_OPTIONS) as workbook:
+        worksheet = workbook.add_worksheet('invoice')
+        header_format = workbook.add_format(_XLSX_HEADER_FORMAT)
+        worksheet.write_row(0, 0, EXPORT_COLUMN_LABELS, header_format)
+        
+        for row_idx, row in enumerate(_export_rows(export), start=1):
+            worksheet.write_row(row_idx, 0, row)
+
+
 @app.route('/export/csv', methods=['POST'])
 def export_csv():
     try:
-        data = request.json
-        items = data.get('items', [])
+        export = _request_export()
 
-        df = _prepare_export_df(items)
-
-        output = io.StringIO()
-        df.to_csv(output, index=False)
+        output = io.BytesIO()
+        if _is_table(export):
+            pacsv.write_csv(export, output)
+        else:
+            export.to_csv(output, index=False, encoding='utf-8')
         output.seek(0)
 
         return send_file(
-            io.BytesIO(output.getvalue().encode()),
+            output,
             mimetype='text/csv',
             as_attachment=True,
             download_name='acuity_invoice.csv'
         )
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _json_response({'error': str(e)}), 500
 
 
 @app.route('/export/excel', methods=['POST'])
 def export_excel():
     try:
-        data = request.json
-        items = data.get('items', [])
-
-        df = _prepare_export_df(items)
+        export = _request_export()
 
         output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='invoice')
+        if xlsxwriter is not None:
+            _write_xlsx(output, export)
+        else:
+            df = export.to_pandas() if _is_table(export) else export
+            with pd.ExcelWriter(output, engine='openpyxl') as writer:
+                df.to_excel(writer, index=False, sheet_name='invoice')
         output.seek(0)
 
         return send_file(
@@ -519,7 +371,7 @@ def export_excel():
         )
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _json_response({'error': str(e)}), 500
 
 
 if __name__ == '__main__':
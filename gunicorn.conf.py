@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration for the Acuity Parser web UI
+
+Usage:
+    gunicorn -c gunicorn.conf.py acuity_parser_ui:app
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# Threaded workers: parsing runs in a process pool (see below), so a request
+# thread only waits on it. gevent workers gain nothing here, and under
+# monkey-patching the pool's helper threads turn into greenlets that can
+# block the whole worker on large uploads
+worker_class = 'gthread'
+threads = 4
+
+# Every web worker parses uploads in its own process pool, so the parse
+# processes total workers x PARSE_WORKERS. By default the CPUs are split
+# between the workers (at least one each); with the default worker count that
+# is one parse process per worker. Raise PARSE_WORKERS with a lower
+# WEB_CONCURRENCY when uploads are few but large.
+parse_workers = os.environ.get('PARSE_WORKERS', max(1, multiprocessing.cpu_count() // workers))
+raw_env = [f'PARSE_WORKERS={parse_workers}']
+
+# Large invoices can take several seconds to parse and export
+timeout = 120
+keepalive = 5